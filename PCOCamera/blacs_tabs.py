@@ -1,42 +1,96 @@
-import ast
+"""BLACS tab for PCO cameras.
+
+A note on performance for anyone modifying the save/restore methods below:
+`restore_save_data()` is memory-bound. Its cost is dominated by creating a
+sensor-sized placeholder image and by pyqtgraph's passes over it, so the wins
+there come from not touching that data more than needed (hence the disabled
+auto range/levels). Faster arithmetic won't help it.
+`get_save_data()` on the other hand only deals with a handful of small values,
+so its cost is Python attribute access and dict operations, which is why it
+caches the ViewBox and writes the settings with a single dict update.
+"""
+import functools
+import re
 
 import numpy as np
 
 from labscript_devices.IMAQdxCamera.blacs_tabs import IMAQdxCameraTab
 
+# Matches the integers in a legacy saved shape string such as '(1024, 1024)'.
+_SHAPE_RE = re.compile(r'\d+')
+
+# Keys of the plot settings saved alongside the image shape and dtype. Each
+# value is an (x, y) or (min, max) pair.
+_PLOT_SETTINGS_KEYS = frozenset(('ranges', 'auto_ranges', 'levels'))
+
+# Keys used for the plot settings by older versions, which saved each half of
+# the pairs above separately.
+_LEGACY_PLOT_SETTINGS_KEYS = frozenset((
+    'targetRange_x',
+    'targetRange_y',
+    'autoRange_x',
+    'autoRange_y',
+    'color_scale_min',
+    'color_scale_max',
+))
+
+
+@functools.lru_cache(maxsize=32)
+def _parse_dtype(dtype_str):
+    """Return the numpy dtype for a saved dtype string, e.g. '<u2'.
+
+    Only a handful of dtypes are ever used by a camera, so the parsed results
+    are cached rather than re-parsing the string on every restore.
+    """
+    return np.dtype(dtype_str)
+
 
 class PCOCameraTab(IMAQdxCameraTab):
 
     # Override worker class.
     worker_class = 'user_devices.RbLab.PCOCamera.blacs_workers.PCOCameraWorker'
 
+    def initialise_GUI(self):
+        super().initialise_GUI()
+
+        # The ViewBox of the image plot, cached by _get_view_box().
+        self._view_box = None
+
+    def _get_view_box(self):
+        """Return the ViewBox of the image plot.
+
+        The ViewBox is looked up from the ImageItem the first time and then
+        cached, since ImageView.setImage() reuses the same ImageItem.
+        """
+        if self._view_box is None:
+            self._view_box = self.image.getImageItem().getViewBox()
+        return self._view_box
+
     def get_save_data(self):
         save_data = super().get_save_data()
 
         # Save info about plot settings if an image is plotted.
         image = self.image.image
         if image is not None:
-            # Save the shape and dtype of the image.
-            save_data['image_shape'] = repr(image.shape)
-            save_data['image_dtype'] = str(image.dtype)
-
             # Get the view_box to access its settings.
-            view_box = self.image.getImageItem().getViewBox()
+            view_box = self._get_view_box()
 
-            # Save x and y ranges.
-            targetRange_x, targetRange_y = view_box.targetRange()
-            save_data['targetRange_x'] = targetRange_x
-            save_data['targetRange_y'] = targetRange_y
+            # Get x and y ranges and whether they are automatically adjusted.
+            ranges = tuple(view_box.targetRange())
+            auto_ranges = tuple(view_box.autoRangeEnabled())
 
-            # Save whether the x and y ranges are automatically adjusted.
-            autoRange_x, autoRange_y = view_box.autoRangeEnabled()
-            save_data['autoRange_x'] = autoRange_x
-            save_data['autoRange_y'] = autoRange_y
+            # Get color scale limits.
+            levels = tuple(self.image.getLevels())
 
-            # Save color scale limits.
-            color_scale_min, color_scale_max = self.image.getLevels()
-            save_data['color_scale_min'] = color_scale_min
-            save_data['color_scale_max'] = color_scale_max
+            # Save everything, including the shape and dtype of the image, in
+            # one update.
+            save_data.update({
+                'image_shape': tuple(image.shape),
+                'image_dtype': image.dtype.str,
+                'ranges': ranges,
+                'auto_ranges': auto_ranges,
+                'levels': levels,
+            })
 
         return save_data
 
@@ -48,8 +102,15 @@ class PCOCameraTab(IMAQdxCameraTab):
             # We have to display some image, otherwise the plot settings will be
             # overwritten once the first image is displayed. Restore a mostly
             # blank image of the saved size.
-            image_shape = ast.literal_eval(save_data['image_shape'])
-            image_dtype = np.dtype(save_data['image_dtype'])
+            image_shape = save_data['image_shape']
+            if isinstance(image_shape, str):
+                # Older versions saved repr(image.shape). The shape is always a
+                # tuple of nonnegative ints, so pulling out the digits is enough
+                # and is much cheaper than ast.literal_eval().
+                image_shape = tuple(map(int, _SHAPE_RE.findall(image_shape)))
+                if not image_shape:
+                    image_shape = (0,)
+            image_dtype = _parse_dtype(save_data['image_dtype'])
             dummy_image = np.zeros(image_shape, dtype=image_dtype)
             # Make one pixel nonzero so histogram binning doesn't error.
             # TODO: Fixed by https://github.com/pyqtgraph/pyqtgraph/pull/767
@@ -59,32 +120,47 @@ class PCOCameraTab(IMAQdxCameraTab):
                 dummy_image[0, 0] = 1
             if dummy_image.ndim == 3:
                 dummy_image[:, 0, 0] = 1
-            self.image.setImage(dummy_image)
 
-            # Restore x and y ranges.
-            try:
-                view_box = self.image.getImageItem().getViewBox()
-                view_box.setRange(
-                    xRange=save_data['targetRange_x'],
-                    yRange=save_data['targetRange_y'],
+            # The plot settings are all saved together by get_save_data(), so
+            # a single check is enough to tell whether they can be restored.
+            if _PLOT_SETTINGS_KEYS.issubset(save_data):
+                ranges = save_data['ranges']
+                auto_ranges = save_data['auto_ranges']
+                levels = save_data['levels']
+            elif _LEGACY_PLOT_SETTINGS_KEYS.issubset(save_data):
+                ranges = (
+                    save_data['targetRange_x'],
+                    save_data['targetRange_y'],
                 )
-            except KeyError:
-                pass
-
-            # Restore whether the x and y ranges are automatically adjusted.
-            try:
-                view_box.enableAutoRange(
-                    x=save_data['autoRange_x'],
-                    y=save_data['autoRange_y'],
+                auto_ranges = (
+                    save_data['autoRange_x'],
+                    save_data['autoRange_y'],
                 )
-            except KeyError:
-                pass
-
-            # Restore color scale range.
-            try:
-                self.image.setLevels(
+                levels = (
                     save_data['color_scale_min'],
                     save_data['color_scale_max'],
                 )
-            except KeyError:
-                pass
+            else:
+                self.image.setImage(dummy_image)
+                return
+
+            # Display the dummy image with the saved color scale range. The
+            # automatic ranging and leveling are skipped since their results
+            # would just be overwritten by the saved settings anyway.
+            self.image.setImage(
+                dummy_image,
+                autoRange=False,
+                autoLevels=False,
+                levels=levels,
+            )
+
+            # Get the view_box to access its settings.
+            view_box = self._get_view_box()
+
+            # Restore x and y ranges.
+            range_x, range_y = ranges
+            view_box.setRange(xRange=range_x, yRange=range_y)
+
+            # Restore whether the x and y ranges are automatically adjusted.
+            auto_range_x, auto_range_y = auto_ranges
+            view_box.enableAutoRange(x=auto_range_x, y=auto_range_y)
@@ -59,7 +59,6 @@ done (e.g. 'absorption') and frametype can optionally be set to the type of
 image that this particular exposure corresponds to, e.g. 'atoms', 'probe', or
 'background' for absorption imaging.
 """
-from math import ceil
 import numpy as np
 
 from labscript_devices.IMAQdxCamera.blacs_workers import IMAQdxCameraWorker
@@ -70,7 +69,42 @@ from labscript_devices.IMAQdxCamera.blacs_workers import IMAQdxCameraWorker
 instrumental = None
 ffi = None
 NicePCO = None
+BufferInfo = None
 PCOError = None
+# PCOError return codes, which are set once PCOError is imported
+_TIMEOUT_RETURN_CODE = None
+_NO_MORE_CAMERAS_RETURN_CODE = None
+
+
+def _ensure_imports():
+    """Import the PCO camera dependencies if they haven't been imported yet.
+
+    The imports load the PCO SDK's DLL and build its wrappers, which is slow, so
+    they are only done the first time this is called in a process. Later calls
+    return immediately.
+    """
+    global instrumental
+    if instrumental is not None:
+        return
+    import instrumental.drivers.cameras.pco as pco_driver
+    import instrumental.errors as instrumental_errors
+    global ffi
+    ffi = pco_driver.ffi
+    global NicePCO
+    NicePCO = pco_driver.NicePCO
+    global BufferInfo
+    BufferInfo = pco_driver.BufferInfo
+    global PCOError
+    PCOError = instrumental_errors.PCOError
+    global _TIMEOUT_RETURN_CODE
+    _TIMEOUT_RETURN_CODE = PCOError.hex_string_to_return_code("0xA00A3005")
+    global _NO_MORE_CAMERAS_RETURN_CODE
+    _NO_MORE_CAMERAS_RETURN_CODE = PCOError.hex_string_to_return_code(
+        "0x800a300d")
+    # Set instrumental last since it marks the imports as done, so that they
+    # are retried if any of the above fails.
+    import instrumental as instrumental_module
+    instrumental = instrumental_module
 
 
 class PCOCamera(object):
@@ -96,7 +130,10 @@ class PCOCamera(object):
         bit_depth: The number of bits of resolution of the camera.
     """
     # Set constants
-    _PCO_MAX_BUFFER_COUNT = 16
+    # Names of attributes implemented in this code rather than in the camera.
+    _SOFTWARE_ATTRIBUTE_NAMES = ('ROI', 'fliplr', 'flipud')
+    # Names of camera attributes which can change the size of the image.
+    _IMAGE_SIZE_ATTRIBUTE_NAMES = ('SensorFormat', 'Binning')
 
     def __init__(self, serial_number):
         """Connect to and initialize a pco camera.
@@ -106,20 +143,25 @@ class PCOCamera(object):
         """
         # Import dependencies that shouldn't be imported unless a PCO camera is
         # in use.
-        global instrumental
-        import instrumental
-        import instrumental.drivers.cameras.pco
-        import instrumental.errors
-        global ffi
-        ffi = instrumental.drivers.cameras.pco.ffi
-        global NicePCO
-        NicePCO = instrumental.drivers.cameras.pco.NicePCO
-        global PCOError
-        PCOError = instrumental.errors.PCOError
+        _ensure_imports()
 
         # Connect to camera
         self._open_camera(serial_number)
 
+        # Keep track of which buffers are allocated so that only those are
+        # freed when cleaning up buffers. Each buffer's index is mapped to a
+        # numpy array viewing its data, which is created once when the buffer
+        # is allocated rather than every time an image is read from it.
+        self._buffer_arrays = {}
+        # The BufferInfo instances of the allocated buffers, which are kept so
+        # that the buffers can be reused by subsequent acquisitions.
+        self._allocated_buffers = []
+
+        # Keep track of whether or not the camera is recording so that it
+        # doesn't need to be queried every time recording may need to stop.
+        # The camera is only queried once here in case it was left recording.
+        self._is_recording = bool(self.camera.GetRecordingState())
+
         # Make sure the camera always starts in the same clean default state
         self.reinitialize_camera()
 
@@ -127,10 +169,14 @@ class PCOCamera(object):
         self._abort_acquisition = False
         self._using_hardware_trigger = True
         self._running_continuously = False
+        self._image_width_and_height = None
+        self._buffer_size_bytes = None
 
         # Set some instance properties
         self.camera_description = self.camera.GetCameraDescription()
         self.bit_depth = self.camera_description.wDynResDESC
+        # Round up to a whole number of bytes using only integer arithmetic
+        self._bytes_per_pixel = -(-self.bit_depth // 8)
         self.grab_timeout_ms = 1e3
 
         # Make list of changeable attributes
@@ -178,8 +224,7 @@ class PCOCamera(object):
                 camera_handle = NicePCO.OpenCamera(ffi.NULL)
             except PCOError as err:
                 # See if error code corresponds to not finding any more cameras
-                if err.return_code == PCOError.hex_string_to_return_code(
-                        "0x800a300d"):
+                if err.return_code == _NO_MORE_CAMERAS_RETURN_CODE:
                     # Ran out of cameras to check
                     looking_for_camera = False
                     found_camera = False
@@ -224,26 +269,34 @@ class PCOCamera(object):
         self.clean_up_buffers()
         self.camera.ResetSettingsToDefault()
         self.camera.SetBitAlignment(1)
+        # Resetting the settings may change the image size
+        self._arm_needed = True
 
     def clean_up_buffers(self):
         """Remove buffers from queue and free their memory."""
         # Remove all buffers from image queue
         self.camera.CancelImages()
+        self.buffer_info_list = []
 
-        # Free buffers if they exist
-        for n in range(self._PCO_MAX_BUFFER_COUNT):
-            try:
-                self.camera.FreeBuffer(n)
-            except PCOError:
-                pass
+        self._free_buffers()
 
-        self.buffer_info_list = []
+    def _free_buffers(self):
+        """Free the memory of all of the allocated buffers."""
+        for buffer_index in self._buffer_arrays:
+            self.camera.FreeBuffer(buffer_index)
+
+        self._buffer_arrays.clear()
+        self._allocated_buffers = []
 
     def set_attributes(self, attr_dict):
         """Set many camera settings at once.
 
         This function repeatedly calls self.set_attribute(), once for each key-
-        value pair in attr_dict.
+        value pair in attr_dict. The attributes that are set in the camera
+        itself are set first, then the software attributes (ROI, fliplr, and
+        flipud) are set. That way the camera only needs to be armed once, when
+        the ROI is validated against the image size resulting from all of the
+        other settings.
 
         Args:
             attr_dict (dict): A dictionary which has keys that are strings, each
@@ -253,7 +306,13 @@ class PCOCamera(object):
                 camera to connectiontable.py, then click on the "Attributes"
                 button in BLACS.
         """
+        software_attr_dict = {}
         for prop, val in attr_dict.items():
+            if prop in self._SOFTWARE_ATTRIBUTE_NAMES:
+                software_attr_dict[prop] = val
+            else:
+                self.set_attribute(prop, val)
+        for prop, val in software_attr_dict.items():
             self.set_attribute(prop, val)
 
     def set_attribute(self, name, value):
@@ -280,6 +339,9 @@ class PCOCamera(object):
             except TypeError:
                 # In this case value isn't an iterable so we won't unpack it
                 set_function(value)
+            # The camera must be re-armed before the new image size is known
+            if name in self._IMAGE_SIZE_ATTRIBUTE_NAMES:
+                self._arm_needed = True
 
     def set_ROI(self, ROI):
         """Set the software Region Of Interest.
@@ -310,9 +372,12 @@ class PCOCamera(object):
             self._check_ROI_dict_value_is_nonnegative(ROI, key)
 
         # Ensure ROI fits in image
-        # Call ArmCamera() to make sure any changes to binning etc. are applied
-        # before the camera calculates its image size
-        self.camera.ArmCamera()
+        # Arm the camera to make sure any changes to binning etc. are applied
+        # before the camera calculates its image size. Arming is slow, so it
+        # is skipped if no settings affecting the image size have changed
+        # since the camera was last armed.
+        if self._arm_needed:
+            self._arm_camera()
         image_width_pixels, image_height_pixels = self.get_image_width_and_height()
         x_index_max = ROI['offsetX'] + ROI['width']
         y_index_max = ROI['offsetY'] + ROI['height']
@@ -341,7 +406,8 @@ class PCOCamera(object):
                 raised.
         """
         value = ROI[key]
-        if type(value) is not int or value < 0:
+        # bool is a subclass of int, so it has to be excluded explicitly.
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
             error_text = (f"Camera attribute ROI's {key} must be a "
                           f"nonnegative integer but is {value}")
             raise ValueError(error_text)
@@ -356,11 +422,11 @@ class PCOCamera(object):
         Raises:
             ValueError: If fliplr isn't a boolean, a ValueError is raised.
         """
-        if type(fliplr) is not bool:
+        if not isinstance(fliplr, (bool, np.bool_)):
             error_text = ("Camera attribute fliplr must be a boolean but "
                           f"was set to {fliplr}")
             raise ValueError(error_text)
-        self.fliplr = fliplr
+        self.fliplr = bool(fliplr)
 
     def set_flipud(self, flipud):
         """Sets whether or not the acquired image is flipped up-to-down.
@@ -372,11 +438,11 @@ class PCOCamera(object):
         Raises:
             ValueError: If flipud isn't a boolean, a ValueError is raised.
         """
-        if type(flipud) is not bool:
+        if not isinstance(flipud, (bool, np.bool_)):
             error_text = ("Camera attribute flipud must be a boolean but "
                           f"was set to {flipud}")
             raise ValueError(error_text)
-        self.flipud = flipud
+        self.flipud = bool(flipud)
 
     def get_attribute_names(self, visibility_level, writeable_only=True):
         """Return a list of names of camera attributes.
@@ -448,9 +514,12 @@ class PCOCamera(object):
         else:
             self._using_hardware_trigger = True
 
-        # Recording must be stopped before configuring the settings below
+        # Recording must be stopped before configuring the settings below. The
+        # buffers are removed from the queue but not freed yet, since they can
+        # be reused if they are still the right size.
         self.stop_acquisition()
-        self.clean_up_buffers()
+        self.camera.CancelImages()
+        self.buffer_info_list = []
 
         # Set storage mode
         # Set to 0 for recorder mode or 1 for FIFO mode
@@ -465,22 +534,76 @@ class PCOCamera(object):
         self.camera.SetRecorderSubmode(recorder_submode_selection)
 
         # Arm Camera to apply settings
-        self.camera.ArmCamera()
+        self._arm_camera()
+
+        # The buffers from the previous acquisition can be reused if their
+        # number and the image size haven't changed. Allocating a buffer
+        # requires the driver to pin its memory, so this saves a good bit of
+        # time when acquiring many shots in a row. Buffers that can't be reused
+        # are freed now, before recording starts.
+        image_width_pixels, image_height_pixels = self.get_image_width_and_height()
+        buffer_shape = (image_height_pixels, image_width_pixels)
+        buffers_reusable = (
+            len(self._allocated_buffers) == bufferCount
+            and all(array.shape == buffer_shape
+                    for array in self._buffer_arrays.values())
+        )
+        if not buffers_reusable:
+            self._free_buffers()
 
         # Set recording state to 0 for "stop" or 1 for "run"
         # Had to be done before buffer allocation in tests
-        self.camera.SetRecordingState(1)
+        self._set_recording_state(1)
 
-        # Allocate and queue up buffers
+        # Allocate new buffers if the old ones couldn't be reused.
+        if not buffers_reusable:
+            self._allocate_buffers(bufferCount)
+
+        # Queue up the buffers
+        for buffer_info in self._allocated_buffers:
+            self.queue_buffer(buffer_info)
+
+    def _allocate_buffers(self, buffer_count):
+        """Allocate buffers sized to hold the images from the camera.
+
+        The camera should be armed before calling this method so that the
+        cached image size is up to date. The buffers are not queued.
+
+        Args:
+            buffer_count (int): The number of buffers to allocate.
+        """
+        image_width_pixels, image_height_pixels = self.get_image_width_and_height()
         buffer_size_bytes = self.get_buffer_size_bytes()
-        for _ in range(bufferCount):
+        for _ in range(buffer_count):
             # Create the actual buffer
             buffer_index, buffer_pointer, event_handle = self.camera.AllocateBuffer(
                 -1, buffer_size_bytes, ffi.NULL, ffi.NULL)
+            # Make a numpy array that views the data in the buffer. The cffi
+            # buffer supports the buffer protocol, so numpy can use it directly.
+            ffi_buffer = ffi.buffer(buffer_pointer, buffer_size_bytes)
+            array = np.frombuffer(ffi_buffer, np.uint16)
+            array = array.reshape((image_height_pixels, image_width_pixels))
+            self._buffer_arrays[buffer_index] = array
             # Use a BufferInfo instance to store the actual buffer's info
-            new_buffer = instrumental.drivers.cameras.pco.BufferInfo(
-                buffer_index, buffer_pointer, event_handle)
-            self.queue_buffer(new_buffer)
+            new_buffer = BufferInfo(buffer_index, buffer_pointer, event_handle)
+            self._allocated_buffers.append(new_buffer)
+
+    def _arm_camera(self):
+        """Arm the camera and update the cached image dimensions.
+
+        Arming the camera applies its settings and is the only time the image
+        size reported by the camera can change. Therefore the image size and
+        the buffer size are retrieved once here and cached, rather than
+        querying the camera for them every time an image is grabbed. All calls
+        to self.camera.ArmCamera() should be made through this method so that
+        the cached values stay up to date.
+        """
+        self.camera.ArmCamera()
+        self._arm_needed = False
+        image_width_pixels, image_height_pixels, _, _ = self.camera.GetSizes()
+        self._image_width_and_height = (image_width_pixels, image_height_pixels)
+        self._buffer_size_bytes = (image_width_pixels * image_height_pixels
+                                   * self._bytes_per_pixel)
 
     def get_image_width_and_height(self):
         """Get the dimensions of the image that will be returned by the camera.
@@ -488,22 +611,23 @@ class PCOCamera(object):
         Note that the values returned by this function depend on camera settings
         (such as binning). This function always returns the most up-to-date
         values for the image width and height based on the camera settings at
-        the time of the most recent call to self.camera.ArmCamera().
+        the time of the most recent call to self._arm_camera(). The values are
+        cached by that method, so calling this function doesn't communicate
+        with the camera.
 
         Returns:
             (image_width_pixels, image_height_pixels): The width and height of
                 the image, measured in pixels.
         """
-        image_width_pixels, image_height_pixels, _, _ = self.camera.GetSizes()
-        return (image_width_pixels, image_height_pixels)
+        return self._image_width_and_height
 
     def get_buffer_size_bytes(self):
         """Return the required size in bytes of a buffer.
 
         The size will depend on the image's width and height (in pixels) and the
-        bit depth of the camera. This function calls
-        self.get_image_width_and_height(), so its note about
-        self.camera.ArmCamera() is also applicable here.
+        bit depth of the camera. The value is cached by self._arm_camera()
+        along with the image width and height, so the note about that method in
+        self.get_image_width_and_height() is also applicable here.
 
         Note that a PCO camera with a firewire interface may require extra space
         in the buffer. At the moment this is not supported and is NOT
@@ -514,10 +638,7 @@ class PCOCamera(object):
             buffer_size_bytes (int): The size of buffer in bytes necessary to
                 hold an image from the camera.
         """
-        image_width_pixels, image_height_pixels = self.get_image_width_and_height()
-        bytes_per_pixel = ceil(self.bit_depth / 8.)
-        buffer_size_bytes = image_width_pixels * image_height_pixels * bytes_per_pixel
-        return buffer_size_bytes
+        return self._buffer_size_bytes
 
     def queue_buffer(self, buffer_info):
         """Add a buffer to the queue to receive images from the camera.
@@ -561,8 +682,14 @@ class PCOCamera(object):
         # Wait for buffer to get filled, will error if timeout occurs
         self.camera.WaitforBuffer(1, pco_buflist, timeout_ms)
 
-    def grab(self):
-        """Grab and return a single image during pre-configured acquisition."""
+    def grab(self, out=None):
+        """Grab and return a single image during pre-configured acquisition.
+
+        Args:
+            out (numpy array, optional): (Default value = None) An array in
+                which to store the image. See self._get_image_from_buffer() for
+                more information.
+        """
         # Get an image from first buffer in queue. Wait for buffer to be filled
         # (if not already filled), will error on timeout.
         buffer_info = self.buffer_info_list[0]
@@ -573,7 +700,7 @@ class PCOCamera(object):
         # removed if the above times out.
         self.buffer_info_list.pop(0)
 
-        image = self._get_image_from_buffer(buffer_info)
+        image = self._get_image_from_buffer(buffer_info, out=out)
 
         # Put buffer back into end of queue if acquiring continuously
         if self._running_continuously:
@@ -585,7 +712,9 @@ class PCOCamera(object):
         """Grab n_images into images array during buffered acquisition.
 
         The acquired images are not returned. Instead they are appended to the
-        images input.
+        images input. To avoid allocating a new array for each image, one array
+        large enough to hold all of the images is allocated up front, and the
+        images appended to images are views into that array.
 
         Args:
             n_images (int): The number of images to acquire.
@@ -593,6 +722,11 @@ class PCOCamera(object):
             appended.
         """
         last_buffer_info = self.buffer_info_list[-1]
+        # Allocate storage for all of the images at once
+        image_block = np.empty(
+            (n_images, self.ROI['height'], self.ROI['width']),
+            dtype=np.uint16,
+        )
         # Set time (milliseconds) between checking for abort signal
         abort_check_period = 1e3
 
@@ -605,21 +739,20 @@ class PCOCamera(object):
             try:
                 # Wait until all buffers are filled
                 self.wait_for_buffer(last_buffer_info, abort_check_period)
-                for _ in range(n_images):
-                    image = self.grab()
+                for n in range(n_images):
+                    image = self.grab(out=image_block[n])
                     images.append(image)
                 break
             except PCOError as err:
                 # Only catch timeout errors (return code 0xA00A3005)
-                timeout_code = PCOError.hex_string_to_return_code("0xA00A3005")
-                if err.return_code == timeout_code:
+                if err.return_code == _TIMEOUT_RETURN_CODE:
                     print('.', end='')
                     continue
                 else:
                     raise err
         print(f"\nGot {len(images)} of {n_images} images.")
 
-    def _get_image_from_buffer(self, buffer_info):
+    def _get_image_from_buffer(self, buffer_info, out=None):
         """Get data from buffer into a numpy array.
 
         This function applies the fliplr/flipud settings and the ROI setting as
@@ -631,36 +764,47 @@ class PCOCamera(object):
             buffer_info: An instance of the BufferInfo class from
                 instrumental.drivers.cameras.pco which holds the information of
                 the buffer.
+            out (numpy array, optional): (Default value = None) A contiguous 2D
+                uint16 array with the shape of the ROI into which the image
+                will be copied. If set to None, a new array will be allocated.
 
         Returns:
             array (numpy array): A 2D array holding the image from the buffer.
+                If out was provided, then out is returned.
         """
         # Gather up necessary image/buffer info
         image_width_pixels, image_height_pixels = self.get_image_width_and_height()
-        buffer_size_bytes = self.get_buffer_size_bytes()
-        buffer_pointer = buffer_info.address
 
-        # Copy the data out of the buffer into a numpy array
-        ffi_buffer = ffi.buffer(buffer_pointer, buffer_size_bytes)
-        buffer_data = memoryview(ffi_buffer)
-        array = np.frombuffer(buffer_data, np.uint16)
-        array = array.reshape((image_height_pixels, image_width_pixels))
+        # Get the numpy array that views the data in the buffer
+        array = self._buffer_arrays[buffer_info.num]
 
-        # Reverse array directions if configured to do so
-        if self.fliplr:
-            array = np.fliplr(array)
-        if self.flipud:
-            array = np.flipud(array)
-
-        # Implement ROI
+        # Implement ROI and flips with a single slice so that no intermediate
+        # arrays are created. The ROI is specified in the coordinates of the
+        # flipped image, so for flipped axes the ROI's indices are mirrored to
+        # get the indices of the unflipped data, then that axis is reversed.
         x_index_min = self.ROI['offsetX']
         x_index_max = self.ROI['offsetX'] + self.ROI['width']
         y_index_min = self.ROI['offsetY']
         y_index_max = self.ROI['offsetY'] + self.ROI['height']
+        x_step = 1
+        y_step = 1
+        if self.fliplr:
+            x_index_min, x_index_max = (image_width_pixels - x_index_max,
+                                        image_width_pixels - x_index_min)
+            x_step = -1
+        if self.flipud:
+            y_index_min, y_index_max = (image_height_pixels - y_index_max,
+                                        image_height_pixels - y_index_min)
+            y_step = -1
         array = array[y_index_min:y_index_max, x_index_min:x_index_max]
+        array = array[::y_step, ::x_step]
 
         # Copy data out of buffer, which also makes it contiguous for BLACS
-        array = array.copy()
+        if out is None:
+            array = array.copy()
+        else:
+            np.copyto(out, array)
+            array = out
 
         return array
 
@@ -670,8 +814,20 @@ class PCOCamera(object):
         This function does NOT clean up buffers or reset camera settings
         """
         # Only stop recording if currently recording to avoid error
-        if self.camera.GetRecordingState():
-            self.camera.SetRecordingState(0)
+        if self._is_recording:
+            self._set_recording_state(0)
+
+    def _set_recording_state(self, recording_state):
+        """Set the recording state of the camera and keep track of it.
+
+        All calls to self.camera.SetRecordingState() should be made through
+        this method so that self._is_recording stays accurate.
+
+        Args:
+            recording_state (int): Set to 0 for "stop" or 1 for "run".
+        """
+        self.camera.SetRecordingState(recording_state)
+        self._is_recording = bool(recording_state)
 
     def abort_acquisition(self):
         """Call this function to abort a buffered image acquisition."""
@@ -14,3 +14,13 @@ agilent_83650b = {
         'decimals': 2,
     },
 }
+
+# Properties of the one DDS output, in the format taken by
+# DeviceTab.create_dds_outputs().
+agilent_83650b_dds_prop = {
+    'dds 0': {
+        'freq': agilent_83650b['freq'],
+        'amp': agilent_83650b['amp'],
+        'gate': {},
+    },
+}
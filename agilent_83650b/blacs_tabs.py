@@ -9,17 +9,13 @@
 #                                                                   #
 #####################################################################
 from blacs.device_base_class import DeviceTab
-from ._hardware_capabilities import agilent_83650b
+from ._hardware_capabilities import agilent_83650b_dds_prop
 
 
 class Agilent83650BTab(DeviceTab):
     def initialise_GUI(self):
         # Create DDS Output objects
-        dds_prop = {'dds 0': {}}
-        dds_prop['dds 0']['freq'] = agilent_83650b['freq']
-        dds_prop['dds 0']['amp'] = agilent_83650b['amp']
-        dds_prop['dds 0']['gate'] = {}
-        self.create_dds_outputs(dds_prop)
+        self.create_dds_outputs(agilent_83650b_dds_prop)
 
         # Create widgets for output objects and auto place the widgets in the
         # UI.
@@ -8,7 +8,9 @@
 # the project for the full license.                                 #
 #                                                                   #
 #####################################################################
-from collections import defaultdict
+import logging
+import math
+import random
 import time
 
 import labscript_utils.h5_lock  # Must be imported before importing h5py.
@@ -24,8 +26,66 @@ from ._hardware_capabilities import agilent_83650b
 # one of these devices is actually used.
 pyvisa = None
 
+# The pyvisa ResourceManager, which is created the first time it's needed and
+# then shared by every connection made from this process.
+_resource_manager = None
+
+logger = logging.getLogger(__name__)
+
+
+def _approx_equal(value, last_value, rel_tol=1e-12, abs_tol=1e-6):
+    """Check if a numeric setting is the same as the last one set.
+
+    Values read from hdf5 files can differ from the ones previously set by a
+    floating point rounding error, which shouldn't trigger reprogramming.
+
+    Args:
+        value (float): The value to be set.
+        last_value (float or None): The value that was last set, or None if no
+            value has been set yet.
+        rel_tol (float, optional): (Default value = 1e-12) The relative
+            tolerance passed to `math.isclose()`.
+        abs_tol (float, optional): (Default value = 1e-6) The absolute
+            tolerance passed to `math.isclose()`.
+
+    Returns:
+        approx_equal (bool): Whether or not the values are equal to within the
+            tolerances. This is always False if last_value is None.
+    """
+    if last_value is None:
+        return False
+    return math.isclose(value, last_value, rel_tol=rel_tol, abs_tol=abs_tol)
+
 
 class _Agilent83650B():
+    # Commands beginning with '++' set options of the Prologix USB-GPIB
+    # converter and aren't sent as messages on the GPIB bus. The converter
+    # processes each newline-terminated line separately, so the commands are
+    # all sent in one write to save USB round trips.
+    _PROLOGIX_CONFIGURATION_COMMANDS = '\n'.join([
+        # Put the converter in "controller" mode to control the 83650B.
+        '++mode 1',
+        # Turn off auto-read which errors for commands with no response.
+        '++auto 0',
+        # Specify GPIB bus address of this device.
+        '++addr {gpib_address}',
+        # GPIB messages need to be terminated with ascii character number ten
+        # and EOI (see synth manual pdf page 109 and Prologix manual page 10).
+        # This is probably not necessary but does work.
+        # Terminate GPIB messages with ascii character 10.
+        '++eos 2',
+        # Enable EOI at end of GPIB messages.
+        '++eoi 1',
+    ])
+
+    # Timeout for communication with the device, in ms. This must be well above
+    # the time the synth can take to settle before answering '*OPC?'.
+    _TIMEOUT = 10000
+
+    # Names of the output settings tracked for smart programming, all of which
+    # start out as None until they are set.
+    _SETTING_NAMES = ('frequency', 'power', 'output_enabled')
+
     def __init__(self, com_port, gpib_address, ramp_between_frequencies,
                  ramp_step_size=None, ramp_min_step_duration=None):
         # Store argument values.
@@ -41,15 +101,18 @@ class _Agilent83650B():
         # Get connection to the device going.
         self._import_python_libraries()
         self._open_resource()
-        self.visa_resource.timeout = 10000  # ms
+        # Opening the resource opens its session, so it only needs to be
+        # reopened after self.close() is called.
+        self._session_closed = False
+        self.visa_resource.timeout = self._TIMEOUT  # ms
         self._configure_gpib_interface()
 
         # Keep track of last set output settings for smart programming.
-        self.last_set_values = defaultdict(lambda: None)
+        self.last_set_values = dict.fromkeys(self._SETTING_NAMES)
 
         # Keep track of actual values output settings so they can be returned
         # when using smart programming.
-        self.last_actual_values = defaultdict(lambda: None)
+        self.last_actual_values = dict.fromkeys(self._SETTING_NAMES)
 
     def _import_python_libraries(self):
         # Import required python libraries.
@@ -66,38 +129,49 @@ class _Agilent83650B():
 
         When blacs opens and tries to connect to many devices at once, the
         drivers sometimes fails to find the device. To work around that, this
-        method tries a few times before giving up.
+        method keeps trying until a deadline is reached before giving up. The
+        time between attempts grows exponentially and is randomized so that
+        devices that failed at the same time don't all retry in lockstep.
 
         Raises:
             pyvisa.errors.VisaIOError: Raised if the connection to the device
-                fails multiple times. If this occurs, it's likely that the
-                device is not connected.
+                fails repeatedly until the deadline. If this occurs, it's likely
+                that the device is not connected.
         """
-        need_to_connect = True
+        # Settings for the backoff between attempts, all in seconds.
+        base_delay = 0.1
+        max_delay = 5
+        timeout = 30
+
+        # Creating a ResourceManager is slow, so only do it once per process.
+        global _resource_manager
+        if _resource_manager is None:
+            _resource_manager = pyvisa.ResourceManager()
+
+        deadline = time.monotonic() + timeout
         n_connection_attempt = 1
-        max_attempts = 10
-        while need_to_connect:
+        while True:
             try:
-                # Print info for debugging.
-                print(f"Connection attempt {n_connection_attempt}...")
+                # Log info for debugging.
+                logger.info("Connection attempt %d...", n_connection_attempt)
 
                 # Try to connect
-                resource_manager = pyvisa.ResourceManager()
-                self.visa_resource = resource_manager.open_resource(
+                self.visa_resource = _resource_manager.open_resource(
                     self.com_port,
                 )
 
                 # If an error wasn't thrown, the connection was a success.
-                need_to_connect = False
-                print("Connected.")
+                logger.info("Connected.")
+                return
             except pyvisa.errors.VisaIOError as err:
-                # Give up if we've hit the max number of attemps, or wait 1
-                # second then try again.
-                if n_connection_attempt >= max_attempts:
+                # Wait a random time up to the current backoff delay, or give up
+                # if that would take us past the deadline.
+                delay = min(max_delay, base_delay * 2**n_connection_attempt)
+                delay = random.uniform(0, delay)
+                if time.monotonic() + delay > deadline:
                     raise err
-                else:
-                    time.sleep(1)
-                    n_connection_attempt += 1
+                time.sleep(delay)
+                n_connection_attempt += 1
 
     def _configure_gpib_interface(self):
         """Configure a Prologix GPIB-USB converter for communcation.
@@ -109,34 +183,26 @@ class _Agilent83650B():
         necessary to override the `self.write()`, `self.query()`, and/or
         `self.read()` methods of this class as well.
         """
-        # Commands beginning with '++' set options of the Prologix USB-GPIB
-        # converter and aren't sent as messages on the GPIB bus.
-
-        # Put the converter in "controller" mode to control the 83650B.
-        self.write('++mode 1')
-        # Turn off auto-read which errors for commands with no response.
-        self.write('++auto 0')
-        # Specify GPIB bus address of this device.
-        self.write(f'++addr {self.gpib_address}')
-
-        # GPIB messages need to be terminated with ascii character number ten
-        # and EOI (see synth manual pdf page 109 and Prologix manual page 10).
-        # This is probably not necessary but does work.
-        # Terminate GPIB messages with ascii character 10.
-        self.write('++eos 2')
-        # Enable EOI at end of GPIB messages.
-        self.write('++eoi 1')
+        self.write(self._PROLOGIX_CONFIGURATION_COMMANDS.format(
+            gpib_address=self.gpib_address,
+        ))
 
     def open(self):
-        """Re-open a connection to the device after calling `self.close()`."""
-        self.visa_resource.open()
+        """Re-open a connection to the device after calling `self.close()`.
+
+        This does nothing if the connection is already open.
+        """
+        if self._session_closed:
+            self.visa_resource.open()
+            self._session_closed = False
 
     def close(self):
         """Close the connection to the device."""
         self.visa_resource.close()
+        self._session_closed = True
 
     def write(self, *args, **kwargs):
-        print(f"Sending: '{args[0]}'")
+        logger.debug("Sending: '%s'", args[0])
         return self.visa_resource.write(*args, **kwargs)
 
     def query(self, *args, **kwargs):
@@ -146,56 +212,56 @@ class _Agilent83650B():
         response = self.query('++read')
         # Remove trailing newline
         response = response.strip()
-        print(f"Received: '{response}'\n")
+        logger.debug("Received: '%s'", response)
         return response
 
+    def _query_int(self, command):
+        """Send a query command and return the synth's response as an int."""
+        self.write(command)
+        return int(self.read())
+
+    def _query_float(self, command):
+        """Send a query command and return the synth's response as a float."""
+        self.write(command)
+        return float(self.read())
+
     @property
     def output_enabled(self):
         """Whether or not the synth's output is enabled."""
-        # Read the power state.
-        self.write(':POWer:STATe?')
-        output_enabled = self.read()
-
-        # Convert '1\n' or '0\n' to boolean.
-        output_enabled = bool(int(output_enabled))
-        return output_enabled
+        # Read the power state, which is reported as 1 or 0.
+        return bool(self._query_int(':POW:STAT?'))
 
     @output_enabled.setter
     def output_enabled(self, output_enabled):
         # Convert the boolean input into 0 or 1.
         output_enabled_int = int(bool(output_enabled))
         # Set output to desired state.
-        self.write(f':POWer:STATe {output_enabled_int}')
+        self.write(f':POW:STAT {output_enabled_int}')
         self.write('*OPC?')  # Wait until operation has completed
         self.read()
         self.last_set_values['output_enabled'] = output_enabled
-        self.last_actual_values['output_enabled'] = self.output_enabled
+        # The *OPC? query above ensures that the setting has been applied, so
+        # there's no need to spend another GPIB round trip reading it back.
+        self.last_actual_values['output_enabled'] = bool(output_enabled)
 
     def smart_set_output_enabled(self, output_enabled, fresh=False):
         if fresh or (output_enabled != self.last_set_values['output_enabled']):
             self.output_enabled = output_enabled
-            print(f"Set ouptut_enabled to {output_enabled}.")
+            logger.debug("Set output_enabled to %s.", output_enabled)
         else:
-            print(f"Used smart programming; didn't change output_enabled.")
+            logger.debug(
+                "Used smart programming; didn't change output_enabled.")
         return self.last_actual_values['output_enabled']
 
     @property
     def frequency(self):
         """The CW frequency of the synth in Hz."""
-        self.write(':FREQuency:CW?')
-        frequency = float(self.read())
-        return frequency
+        return self._query_float(':FREQ:CW?')
 
     @frequency.setter
     def frequency(self, frequency):
         # Ensure input is within the achievable range.
-        freq_min = self.capabilities['freq']['min']
-        freq_max = self.capabilities['freq']['max']
-        base_unit = self.capabilities['freq']['base_unit']
-        if frequency < freq_min or frequency > freq_max:
-            msg = f"""Frequency must be between {freq_min} {base_unit} and
-            {freq_max} {base_unit}, but was set to {frequency} {base_unit}."""
-            raise ValueError(dedent(msg))
+        self._check_frequency(frequency)
 
         # Send the signal(s) to adjust the frequency.
         if self.ramp_between_frequencies:
@@ -215,7 +281,7 @@ class _Agilent83650B():
             # within self.min_step_duration of each other.
             for frequency in frequencies:
                 write_time = time.perf_counter()
-                self.write(f':FREQuency:CW {frequency} Hz')
+                self.write(f':FREQ:CW {frequency} Hz')
                 self.write('*OPC?')  # Wait until operation has completed
                 self.read()
                 write_duration = (time.perf_counter() - write_time)
@@ -223,53 +289,146 @@ class _Agilent83650B():
                 sleep_duration = max(sleep_duration, 0)
                 time.sleep(sleep_duration)
         else:
-            self.write(f':FREQuency:CW {frequency} Hz')
+            self.write(f':FREQ:CW {frequency} Hz')
             self.write('*OPC?')  # Wait until operation has completed
             self.read()
         self.last_set_values['frequency'] = frequency
-        self.last_actual_values['frequency'] = self.frequency
+        self.last_actual_values['frequency'] = frequency
 
     def smart_set_frequency(self, frequency, fresh=False):
-        if fresh or (frequency != self.last_set_values['frequency']):
+        if fresh or not _approx_equal(frequency,
+                                      self.last_set_values['frequency']):
             self.frequency = frequency
-            print(f"Set frequency to {frequency}.")
+            logger.debug("Set frequency to %s.", frequency)
         else:
-            print("Used smart programming; didn't change frequency.")
+            logger.debug("Used smart programming; didn't change frequency.")
         return self.last_actual_values['frequency']
 
     @property
     def power(self):
         """The output power of the synth in dBm."""
-        self.write(':POWer:LEVel?')
-        power = float(self.read())
-        return power
+        return self._query_float(':POW:LEV?')
 
     @power.setter
     def power(self, power):
         # Ensure power is within the achievable range.
-        amp_min = self.capabilities['amp']['min']
-        amp_max = self.capabilities['amp']['max']
-        base_unit = self.capabilities['amp']['base_unit']
-        if power < amp_min or power > amp_max:
-            msg = f"""Power must be between {amp_min} {base_unit} and {amp_max}
-            {base_unit}, but was set to {power} {base_unit}."""
-            raise ValueError(dedent(msg))
+        self._check_power(power)
 
-        # Send the signal to set the power.
-        self.write(f':POWer:LEVel {power:.2f} dBm')
+        # Send the signal to set the power. It is sent with two decimal
+        # places, so round it the same way to record the value actually set.
+        power = round(power, 2)
+        self.write(f':POW:LEV {power:.2f} dBm')
         self.write('*OPC?')  # Wait until operation has completed
         self.read()
         self.last_set_values['power'] = power
-        self.last_actual_values['power'] = self.power
+        self.last_actual_values['power'] = power
 
     def smart_set_power(self, power, fresh=False):
-        if fresh or (power != self.last_set_values['power']):
+        # Round the same way as the power setter so that the comparison to the
+        # last set value isn't thrown off by digits that are never sent.
+        power = round(power, 2)
+        if fresh or not _approx_equal(power, self.last_set_values['power']):
             self.power = power
-            print(f"Set power to {power}.")
+            logger.debug("Set power to %s.", power)
         else:
-            print("Used smart programming; didn't change power.")
+            logger.debug("Used smart programming; didn't change power.")
         return self.last_actual_values['power']
 
+    def program_all(self, frequency, power, output_enabled):
+        """Set the frequency, power, and output state together.
+
+        The settings are sent as one compound SCPI message, followed by a
+        single `*OPC?` query, rather than as separate messages for each
+        setting. If `self.ramp_between_frequencies` is set then the frequency
+        is still ramped step by step, and only the other settings are sent
+        together.
+
+        Args:
+            frequency (float): The CW frequency to set in Hz.
+            power (float): The output power to set in dBm.
+            output_enabled (bool): Whether or not the output should be on.
+
+        Raises:
+            ValueError: If the frequency or power is out of the range supported
+                by the synth.
+        """
+        # Check all of the values before sending anything.
+        self._check_frequency(frequency)
+        self._check_power(power)
+
+        commands = []
+        if self.ramp_between_frequencies:
+            self.frequency = frequency
+        else:
+            commands.append(f':FREQ:CW {frequency} Hz')
+        power = round(power, 2)
+        commands.append(f':POW:LEV {power:.2f} dBm')
+        commands.append(f':POW:STAT {int(bool(output_enabled))}')
+        commands.append('*OPC?')  # Wait until operation has completed
+        self.write(';'.join(commands))
+        self.read()
+
+        self.last_set_values['frequency'] = frequency
+        self.last_actual_values['frequency'] = frequency
+        self.last_set_values['power'] = power
+        self.last_actual_values['power'] = power
+        self.last_set_values['output_enabled'] = output_enabled
+        self.last_actual_values['output_enabled'] = bool(output_enabled)
+
+    def _check_frequency(self, frequency):
+        """Raise a ValueError if frequency is out of the synth's range."""
+        freq_min = self.capabilities['freq']['min']
+        freq_max = self.capabilities['freq']['max']
+        base_unit = self.capabilities['freq']['base_unit']
+        if frequency < freq_min or frequency > freq_max:
+            msg = f"""Frequency must be between {freq_min} {base_unit} and
+            {freq_max} {base_unit}, but was set to {frequency} {base_unit}."""
+            raise ValueError(dedent(msg))
+
+    def _check_power(self, power):
+        """Raise a ValueError if power is out of the synth's range."""
+        amp_min = self.capabilities['amp']['min']
+        amp_max = self.capabilities['amp']['max']
+        base_unit = self.capabilities['amp']['base_unit']
+        if power < amp_min or power > amp_max:
+            msg = f"""Power must be between {amp_min} {base_unit} and {amp_max}
+            {base_unit}, but was set to {power} {base_unit}."""
+            raise ValueError(dedent(msg))
+
+    def refresh_actual_values(self):
+        """Read the output settings back from the synth.
+
+        The setters record the values that they send as the actual values
+        rather than reading them back from the synth, which would double the
+        number of GPIB round trips. This method can be called to update
+        `self.last_actual_values` with the settings reported by the synth if
+        they need to be verified.
+
+        Returns:
+            last_actual_values (dict): The updated `self.last_actual_values`.
+        """
+        frequency, power, output_enabled = self.read_all_settings()
+        self.last_actual_values['frequency'] = frequency
+        self.last_actual_values['power'] = power
+        self.last_actual_values['output_enabled'] = output_enabled
+        return self.last_actual_values
+
+    def read_all_settings(self):
+        """Read the frequency, power, and output state with one query.
+
+        The three queries are sent as one compound SCPI message, so the synth
+        returns all of the settings in a single semicolon-separated response.
+
+        Returns:
+            frequency (float): The CW frequency of the synth in Hz.
+            power (float): The output power of the synth in dBm.
+            output_enabled (bool): Whether or not the synth's output is
+                enabled.
+        """
+        self.write(':FREQ:CW?;:POW:LEV?;:POW:STAT?')
+        frequency, power, output_enabled = self.read().split(';')
+        return float(frequency), float(power), bool(int(output_enabled))
+
 
 class _MockAgilent83650B(_Agilent83650B):
     def __init__(self, com_port, gpib_address, ramp_between_frequencies,
@@ -285,7 +444,11 @@ class _MockAgilent83650B(_Agilent83650B):
         self.capabilities = agilent_83650b
 
         # Keep track of last set output settings for smart programming.
-        self.last_set_values = defaultdict(lambda: None)
+        self.last_set_values = dict.fromkeys(self._SETTING_NAMES)
+
+        # Keep track of actual values output settings so they can be returned
+        # when using smart programming.
+        self.last_actual_values = dict.fromkeys(self._SETTING_NAMES)
 
         # Store mocked parameters. We'll use somewhat random values for initial
         # settings.
@@ -308,6 +471,7 @@ class _MockAgilent83650B(_Agilent83650B):
     def output_enabled(self, output_enabled):
         self._mock_output_enabled = output_enabled
         self.last_set_values['output_enabled'] = output_enabled
+        self.last_actual_values['output_enabled'] = bool(output_enabled)
 
     @property
     def frequency(self):
@@ -317,17 +481,12 @@ class _MockAgilent83650B(_Agilent83650B):
     @frequency.setter
     def frequency(self, frequency):
         # Ensure input is within the achievable range.
-        freq_min = self.capabilities['freq']['min']
-        freq_max = self.capabilities['freq']['max']
-        base_unit = self.capabilities['freq']['base_unit']
-        if frequency < freq_min or frequency > freq_max:
-            msg = f"""Frequency must be between {freq_min} {base_unit} and
-            {freq_max} {base_unit}, but was set to {frequency} {base_unit}."""
-            raise ValueError(dedent(msg))
+        self._check_frequency(frequency)
 
         # Store the mocked frequency setting.
         self._mock_frequency = frequency
         self.last_set_values['frequency'] = frequency
+        self.last_actual_values['frequency'] = frequency
 
     @property
     def power(self):
@@ -337,21 +496,41 @@ class _MockAgilent83650B(_Agilent83650B):
     @power.setter
     def power(self, power):
         # Ensure power is within the achievable range.
-        amp_min = self.capabilities['amp']['min']
-        amp_max = self.capabilities['amp']['max']
-        base_unit = self.capabilities['amp']['base_unit']
-        if power < amp_min or power > amp_max:
-            msg = f"""Power must be between {amp_min} {base_unit} and {amp_max}
-            {base_unit}, but was set to {power} {base_unit}."""
-            raise ValueError(dedent(msg))
+        self._check_power(power)
 
-        # Store the mocked power setting.
+        # Round to the resolution the real synth uses, then store the mocked
+        # power setting.
+        power = round(power, 2)
         self._mock_power = power
         self.last_set_values['power'] = power
+        self.last_actual_values['power'] = power
+
+    def read_all_settings(self):
+        """Get the mocked frequency, power, and output state."""
+        return self.frequency, self.power, self.output_enabled
+
+    def program_all(self, frequency, power, output_enabled):
+        """Set the mocked frequency, power, and output state together."""
+        # Check all of the values before changing anything.
+        self._check_frequency(frequency)
+        self._check_power(power)
+        self.frequency = frequency
+        self.power = power
+        self.output_enabled = output_enabled
 
 
 class Agilent83650BWorker(Worker):
+    # How long, in seconds, values read by check_remote_values() are reused
+    # for if no settings have been sent to the synth in the meantime.
+    remote_values_max_age = 1.0
+
     def init(self):
+        # Cache of the settings last read from the synth, along with the
+        # time.monotonic() time when they were read. This is invalidated
+        # whenever any settings are sent to the synth.
+        self._remote_values_cache = None
+        self._remote_values_read_time = None
+
         if self.mock:
             self.synth = _MockAgilent83650B(
                 self.com_port,
@@ -370,20 +549,52 @@ class Agilent83650BWorker(Worker):
             )
 
     def check_remote_values(self):
+        # Only query the synth if nothing has been sent to it since the values
+        # were last read and they aren't too old, since each query is a GPIB
+        # round trip.
+        now = time.monotonic()
+        cache_is_valid = (
+            self._remote_values_cache is not None
+            and now - self._remote_values_read_time < self.remote_values_max_age
+        )
+        if not cache_is_valid:
+            synth_values = self.synth.refresh_actual_values()
+            self._remote_values_cache = {
+                'freq': synth_values['frequency'],
+                'amp': synth_values['power'],
+                'gate': synth_values['output_enabled'],
+            }
+            self._remote_values_read_time = now
+
         remote_values = {}
         # There should only be one connection ('dds 0') but we'll iterate anyway
         # to extract the value from the dictionary.
         for connection in self.child_connections:
-            remote_values[connection] = {}
-            remote_values[connection]['freq'] = self.synth.frequency
-            remote_values[connection]['amp'] = self.synth.power
-            remote_values[connection]['gate'] = self.synth.output_enabled
+            remote_values[connection] = dict(self._remote_values_cache)
         return remote_values
 
     def set_output_settings(self, values, fresh=False):
+        # The synth's settings are about to change, so previously read values
+        # are no longer valid.
+        self._remote_values_cache = None
+
         actual_values = {}
         for connection, values_dict in values.items():
             actual_values[connection] = {}
+            if fresh:
+                # Every setting needs to be sent, so send them all at once.
+                self.synth.program_all(
+                    values_dict['freq'],
+                    values_dict['amp'],
+                    values_dict['gate'],
+                )
+                synth_values = self.synth.last_actual_values
+                actual_values[connection] = {
+                    'freq': synth_values['frequency'],
+                    'amp': synth_values['power'],
+                    'gate': synth_values['output_enabled'],
+                }
+                continue
             # Set frequency.
             frequency = values_dict['freq']
             actual_frequency = self.synth.smart_set_frequency(
@@ -415,8 +626,10 @@ class Agilent83650BWorker(Worker):
         with h5py.File(h5file, 'r') as hdf5_file:
             group = hdf5_file['/devices/' + device_name]
             if 'static_values' in group:
-                data = group['static_values']
-                values = {name: data[0][name] for name in data.dtype.names}
+                # Read the single row of the table from the file once, then
+                # get the fields from the in-memory copy.
+                row = group['static_values'][0]
+                values = {name: row[name] for name in row.dtype.names}
             else:
                 values = {}
         values = {'dds 0': values}
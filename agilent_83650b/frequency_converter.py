@@ -9,11 +9,14 @@ class FrequencyConverter(UnitConversion):
     # base unit and once as the derived unit.
     derived_units = ['Hz']
 
+    # Prefixes used for the derived unit if none are specified in params.
+    default_magnitudes = ('k', 'M', 'G')
+
     def __init__(self, params=None):
-        if params is None:
-            params = {}
-        if 'magnitudes' not in params:
-            params['magnitudes'] = ['k', 'M', 'G']
+        # Copy params rather than adding the default magnitudes to the caller's
+        # dict, which may be shared between outputs.
+        params = dict(params) if params else {}
+        params.setdefault('magnitudes', list(self.default_magnitudes))
         super().__init__(params)
 
     def Hz_from_base(self, base):
@@ -342,12 +342,14 @@ class Agilent83650B(Device):
         dtypes = [
             ('freq', np.float64),
             ('amp', np.float64),
-            ('gate', np.bool),
+            ('gate', np.bool_),
         ]
-        static_value_table = np.empty(1, dtype=dtypes)
-        static_value_table['freq'][0] = output.frequency.static_value
-        static_value_table['amp'][0] = output.amplitude.static_value
-        static_value_table['gate'][0] = output.output_enabled.static_value
+        static_value_table = np.zeros(1, dtype=dtypes)
+        static_value_table[0] = (
+            output.frequency.static_value,
+            output.amplitude.static_value,
+            output.output_enabled.static_value,
+        )
 
         grp = self.init_device_group(hdf5_file)
         grp.create_dataset('static_values', data=static_value_table)
@@ -9,6 +9,9 @@
 #                                                                   #
 #####################################################################
 from collections import defaultdict
+import contextlib
+import logging
+import struct
 import sys
 import time
 
@@ -26,16 +29,32 @@ from labscript_utils import dedent
 # one of these devices is actually used.
 pyvisa = None
 
+# The pyvisa ResourceManager, which is created the first time it's needed and
+# then shared by every connection made from this process.
+_resource_manager = None
+
+logger = logging.getLogger(__name__)
+
+# The hex characters used for bus addresses, indexed by address.
+_ADDRESS_CHARS = '0123456789ABCDEF'
+
+# Packs/unpacks big-endian signed 32 bit integers, which is how positions are
+# almost always sent to and from devices.
+_INT32 = struct.Struct('>i')
+
 
 class ElliptecError(Exception):
     """A class for raising errors issued by Elliptec Devices.
 
     Args:
-        error_code (str of int): The error code returned by an Elliptec device.
+        error_code (str of int, optional): (Default=None) The error code
+            returned by an Elliptec device.
+        message (str, optional): (Default=None) A description of the error. If
+            set to None, the description of `error_code` is used.
     """
 
-    def __init__(self, error_code):
-        self.error_code = int(error_code)
+    def __init__(self, error_code=None, message=None):
+        self.error_code = None if error_code is None else int(error_code)
 
         error_info = {
             1: "Communication time out.",
@@ -56,12 +75,13 @@ class ElliptecError(Exception):
             13: "Over Current error.",
         }
 
-        if error_code == 0:
-            message = "No error."
-        elif error_code in error_info:
-            message = f"Error {error_code}: {error_info[error_code]}"
-        else:
-            message = f"Error {error_code}: Undefined Error."
+        if message is None:
+            if self.error_code == 0:
+                message = "No error."
+            elif self.error_code in error_info:
+                message = f"Error {error_code}: {error_info[self.error_code]}"
+            else:
+                message = f"Error {error_code}: Undefined Error."
 
         super().__init__(message)
 
@@ -89,7 +109,7 @@ class _MockElliptecInterface(MockZaberInterface):
         self.position = 0
         # Update last set position.
         self.last_set_positions_in_counts[address] = None
-        print(f"Mock device {address} homed.")
+        logger.info("Mock device %s homed.", address)
 
     def move(self, address, position, fresh=True):
         last_set_position = self.last_set_positions_in_counts[address]
@@ -98,12 +118,29 @@ class _MockElliptecInterface(MockZaberInterface):
             # Update last set position.
             self.last_set_positions_in_counts[address] = position
         else:
-            print(
-                f"Mock used smart programming; didn't move address {address}.")
+            logger.debug(
+                "Mock used smart programming; didn't move address %s.", address)
+
+    def move_many(self, positions_in_counts, fresh=True):
+        responses = {}
+        for address, position in positions_in_counts.items():
+            responses[address] = self.move(address, position, fresh=fresh)
+        return responses
 
     def get_serial_number(self, address):
         return '12345678'
 
+    def home_many(self, addresses, clockwise=True):
+        for address in addresses:
+            self.home(address)
+
+    def get_serial_numbers(self, addresses):
+        return {address: self.get_serial_number(address)
+                for address in addresses}
+
+    def get_positions(self, addresses):
+        return {address: self.get_position(address) for address in addresses}
+
 
 class _ElliptecInterface(object):
     """Class for interfacing with Thorlabs Elliptec devices.
@@ -158,7 +195,12 @@ class _ElliptecInterface(object):
     """
     # Properties that should be kept by subclasses.
     read_termination = '\r\n'
+    write_termination = '\r\n'
     default_timeout = 30e3  # milliseconds.
+    # Shorter timeout used for queries that are answered right away, rather
+    # than after a device finishes moving, so that a missing device is noticed
+    # quickly.
+    query_timeout = 500  # milliseconds.
 
     def __init__(self, com_port):
         """Initialize the interface.
@@ -185,41 +227,47 @@ class _ElliptecInterface(object):
 
         When blacs opens and tries to connect to many devices at once, the
         drivers sometimes fails to find the device. To work around that, this
-        method tries a few times before giving up.
+        method tries a few times before giving up. The failures are typically
+        brief, so the first retry is made immediately and the delay before each
+        subsequent retry doubles, starting at 0.1 seconds and capped at 1
+        second.
 
         Raises:
             pyvisa.errors.VisaIOError: Raised if the connection to the device
                 fails multiple times. If this occurs, it's likely that the
                 device is not connected.
         """
-        need_to_connect = True
-        n_connection_attempt = 1
-        max_attempts = 10
-        while need_to_connect and (n_connection_attempt <= max_attempts):
+        # Creating a ResourceManager is slow, so only do it once per process.
+        global _resource_manager
+        if _resource_manager is None:
+            _resource_manager = pyvisa.ResourceManager()
+
+        max_attempts = 6
+        for n_connection_attempt in range(1, max_attempts + 1):
+            # Wait before retrying, except for the first retry.
+            if n_connection_attempt > 2:
+                time.sleep(min(0.05 * 2**(n_connection_attempt - 2), 1.0))
             try:
-                # Print info for debugging.
-                print(f"Connection attempt {n_connection_attempt}...")
+                # Log info for debugging.
+                logger.info("Connection attempt %d...", n_connection_attempt)
 
                 # Try to connect
-                resource_manager = pyvisa.ResourceManager()
-                self.visa_resource = resource_manager.open_resource(
+                self.visa_resource = _resource_manager.open_resource(
                     self.com_port,
                 )
                 self.visa_resource.read_termination = self.read_termination
+                self.visa_resource.write_termination = self.write_termination
                 self.visa_resource.timeout = self.default_timeout
 
                 # If an error wasn't thrown, the connection was a success.
-                need_to_connect = False
-                print("Connected.")
+                logger.info("Connected.")
+                return
             except pyvisa.errors.VisaIOError as err:
-                n_connection_attempt += 1
                 connection_error = err  # Save for re-raising later.
-                time.sleep(1)
 
         # If we still haven't connected after multiple tries, give up and raise
         # the error.
-        if need_to_connect:
-            raise connection_error
+        raise connection_error
 
     def open(self):
         """Re-open a connection to the device after calling `self.close()`."""
@@ -243,15 +291,24 @@ class _ElliptecInterface(object):
         Returns:
             address (str): The bus address of the device, represented in
                 hexadecimal as a string with a single character.
+
+        Raises:
+            ValueError: If the address isn't between 0 and 15 inclusively.
         """
-        return '{:X}'.format(int(address))
+        address_int = int(address)
+        if not 0 <= address_int < len(_ADDRESS_CHARS):
+            raise ValueError(
+                f"Invalid bus address {address!r}; it must be an integer "
+                "between 0 and 15 inclusively."
+            )
+        return _ADDRESS_CHARS[address_int]
 
     def write(self, address, message, **kwargs):
         """Send a message over the bus.
 
         This method combines the address and message content into a single
-        string then sends the message over the bus. Messages are also printed to
-        the console before being sent, which can be useful for debugging
+        string then sends the message over the bus. Messages are also logged at
+        the debug level before being sent, which can be useful for debugging
         purposes.
 
         Args:
@@ -267,8 +324,8 @@ class _ElliptecInterface(object):
         # Construct message.
         addressed_message = self._address_to_str(address) + message
 
-        # Print message to console for debugging purposes.
-        print(addressed_message)
+        # Log message for debugging purposes.
+        logger.debug("Sending: '%s'", addressed_message)
 
         self.visa_resource.write(addressed_message, **kwargs)
 
@@ -293,10 +350,8 @@ class _ElliptecInterface(object):
         # Get response.
         response = self.visa_resource.read(**kwargs)
 
-        # Print response to console for debugging purposes.
-        print(response)
-        # Print an empty line to visually separate next message.
-        print()
+        # Log response for debugging purposes.
+        logger.debug("Received: '%s'", response)
 
         # Parse response.
         address = response[0]
@@ -305,11 +360,30 @@ class _ElliptecInterface(object):
 
         return (address, command, data)
 
-    def query(self, address, message, delay=None):
+    @contextlib.contextmanager
+    def _timeout(self, timeout):
+        """Context manager to temporarily change the timeout for reading.
+
+        Args:
+            timeout (float): The timeout to use in milliseconds. If set to
+                None, the timeout won't be changed.
+        """
+        if timeout is None:
+            yield
+            return
+        previous_timeout = self.visa_resource.timeout
+        self.visa_resource.timeout = timeout
+        try:
+            yield
+        finally:
+            self.visa_resource.timeout = previous_timeout
+
+    def query(self, address, message, delay=None, timeout=None):
         """Send a command and receive the response.
 
-        This is simply a convenience method that calls `self.write()` then
-        `self.read()`.
+        This is equivalent to calling `self.write()` then `self.read()`, but the
+        message is sent and the response is read with a single call to
+        `self.visa_resource.query()`.
 
         Args:
             address (int): The bus address of a device, which should be an
@@ -321,17 +395,103 @@ class _ElliptecInterface(object):
             delay (float, optional): (Default=None) The time to wait between
                 issuing the command and reading the response. If set to None,
                 there will be no extra delay.
+            timeout (float, optional): (Default=None) The timeout for reading
+                the response in milliseconds. If set to None,
+                `self.default_timeout` is used.
 
         Returns:
             response (tuple): The tuple returned by `self.read()`. See that
                 method's documentation for more information.
         """
-        self.write(address, message)
+        # Construct message.
+        addressed_message = self._address_to_str(address) + message
+
+        # Log message for debugging purposes.
+        logger.debug("Sending: '%s'", addressed_message)
+
+        with self._timeout(timeout):
+            response = self.visa_resource.query(addressed_message, delay=delay)
+
+        # Log response for debugging purposes.
+        logger.debug("Received: '%s'", response)
+
+        # Parse response as done in self.read().
+        return (response[0], response[1:3], response[3:])
+
+    def query_many(self, messages, expected_command, timeout=None):
+        """Send commands to several devices and check all of the responses.
+
+        The devices share one serial line with no arbitration, so replies sent
+        at the same time could collide. Therefore each command is only sent
+        once the previous device has replied. Every response is checked to
+        make sure that it came from the queried device and has the expected
+        command code.
+
+        Args:
+            messages (list): A list of `(address, message)` tuples, where
+                `address` and `message` are as described for `self.write()`.
+            expected_command (str): The two capital letters expected in the
+                command part of each response, e.g. `'PO'` for a position.
+            timeout (float, optional): (Default=None) The timeout for reading
+                each response in milliseconds. If set to None,
+                `self.default_timeout` is used.
+
+        Returns:
+            responses (dict): A dictionary with the addresses from `messages`
+                as its keys and the tuples returned by `self.read()` as its
+                values.
+
+        Raises:
+            ElliptecError: If a device doesn't respond, a response comes from a
+                different address, or a response has an unexpected command
+                code. If a device responds with its status instead, the error
+                reported by that status is raised.
+        """
+        responses = {}
+        for address, message in messages:
+            try:
+                response = self.query(address, message, timeout=timeout)
+            except pyvisa.errors.VisaIOError as err:
+                raise ElliptecError(
+                    1,
+                    f"No response from address {address} to '{message}'.",
+                ) from err
+            # Checking the address of each response also ensures that the
+            # responses come from exactly the set of devices queried.
+            self._check_response(address, response, expected_command)
+            responses[address] = response
+        return responses
+
+    def _check_response(self, address, response, expected_command):
+        """Ensure that a response is the one expected from a device.
 
-        if delay:
-            time.sleep(delay)
+        Args:
+            address (int): The bus address of the device that was queried.
+            response (tuple): The tuple returned by `self.read()`.
+            expected_command (str): The two capital letters expected in the
+                command part of the response.
 
-        return self.read()
+        Raises:
+            ElliptecError: If the response came from a different address or has
+                an unexpected command code. If the device responded with a
+                nonzero status instead, the error for that status is raised.
+        """
+        response_address, command, data = response
+        if response_address != self._address_to_str(address):
+            raise ElliptecError(
+                message=(f"Expected a response from address {address} but got "
+                         f"'{''.join(response)}'."),
+            )
+        if command == expected_command:
+            return
+        if command == 'GS':
+            status_code = int(data, 16)
+            if status_code != 0:
+                raise ElliptecError(status_code)
+        raise ElliptecError(
+            message=(f"Expected a '{expected_command}' response from address "
+                     f"{address} but got '{''.join(response)}'."),
+        )
 
     def clear_receiving_state_machine(self):
         """Clear the Elliptec device's receiving state machine.
@@ -357,7 +517,7 @@ class _ElliptecInterface(object):
                 method's documentation for more information.
         """
         # 'in' for info
-        info_string = self.query(address, 'in')
+        info_string = self.query(address, 'in', timeout=self.query_timeout)
 
         # TODO: Interpret info string.
 
@@ -373,11 +533,53 @@ class _ElliptecInterface(object):
         Returns:
             serial_number (str): The serial number of the device, as a string.
         """
-        # Put parse info string back together so that indices here match up with
-        # indices in Elliptec documentation.
-        info_string = ''.join(self.get_info(address))
-        serial_number = info_string[5:13]
-        return serial_number
+        _, _, info_data = self.get_info(address)
+        return self._serial_number_from_info_data(info_data)
+
+    def _serial_number_from_info_data(self, info_data):
+        """Extract the serial number from the data of an info response.
+
+        Args:
+            info_data (str): The data part of the response to an 'in' command,
+                as returned by `self.read()`.
+
+        Returns:
+            serial_number (str): The serial number of the device, as a string.
+        """
+        # In the Elliptec documentation the serial number is at indices 5:13 of
+        # the full response, which includes the one-character address and the
+        # two-character command before the data.
+        return info_data[2:10]
+
+    def get_serial_numbers(self, addresses):
+        """Get the serial numbers of several Elliptec devices.
+
+        The info requests are sent with `self.query_many()`, which checks the
+        responses.
+
+        Args:
+            addresses (list): The bus addresses of the devices.
+
+        Returns:
+            serial_numbers (dict): A dictionary with the addresses as its keys
+                and the serial numbers, as strings, as its values.
+
+        Raises:
+            ElliptecError: If a device doesn't respond as expected.
+        """
+        # 'in' for info, which devices answer with 'IN'.
+        messages = [(address, 'in') for address in addresses]
+        responses = self.query_many(
+            messages,
+            'IN',
+            timeout=self.query_timeout,
+        )
+        serial_numbers = {}
+        for address, (_, _, info_data) in responses.items():
+            serial_numbers[address] = self._serial_number_from_info_data(
+                info_data,
+            )
+        return serial_numbers
 
     def check_status(self, address):
         """Check the error status of the Elliptec device.
@@ -394,7 +596,11 @@ class _ElliptecInterface(object):
             ElliptecError: The error raised in the Elliptec device.
         """
         # gs for get Status.
-        _, _, status_code = self.query(address, 'gs')
+        _, _, status_code = self.query(
+            address,
+            'gs',
+            timeout=self.query_timeout,
+        )
 
         # Convert from string.
         status_code = int(status_code)
@@ -419,25 +625,31 @@ class _ElliptecInterface(object):
             position_as_str (str): The position represented as a string of hex
                 characters in two's complement format for the given number of
                 bits.
+
+        Raises:
+            OverflowError: If the position can't be represented with the given
+                number of bits.
         """
-        # Deal with the cast that position_in_counts is negative.
-        if position_in_counts < 0:
-            # Figure out value where numbers wrap around. For 2's complement
-            # that value is 2^(n_bits -1).
-            wrap_around_value = 2**(n_bits - 1)
-            amount_exceeded = position_in_counts - (-wrap_around_value)
-            position_in_counts = wrap_around_value + amount_exceeded
-
-        # Round position to nearest integer.
-        position_in_counts = round(position_in_counts)
-        # Ensure numpy floats are converted to integers.
-        position_in_counts = int(position_in_counts)
-
-        # Convert to series of hex characters with captial letters and no
+        # Round position to nearest integer, which also ensures numpy floats are
+        # converted to python integers.
+        position_in_counts = int(round(position_in_counts))
+
+        # Use the precompiled struct for the usual 32 bit case.
+        if n_bits == 32:
+            try:
+                return _INT32.pack(position_in_counts).hex().upper()
+            except struct.error as err:
+                raise OverflowError(str(err)) from err
+
+        # int.to_bytes() takes care of the two's complement representation, then
+        # the bytes are converted to hex characters with capital letters and no
         # leading "0x".
-        # '0' means pad with 0's, '>' means right-justify number, and 'X' for
-        # hex.
-        position_as_str = '{:0>8X}'.format(position_in_counts)
+        position_as_bytes = position_in_counts.to_bytes(
+            n_bits // 8,
+            'big',
+            signed=True,
+        )
+        position_as_str = position_as_bytes.hex().upper()
 
         return position_as_str
 
@@ -465,6 +677,18 @@ class _ElliptecInterface(object):
             # Each hex character gives 4 bits of information.
             n_bits = 4 * len(position_as_str)
 
+        # In the usual case that the string specifies a whole number of bytes
+        # and has the given number of bits, struct or int.from_bytes() can take
+        # care of the two's complement conversion directly.
+        if n_bits == 32 and len(position_as_str) == 8:
+            return _INT32.unpack(bytes.fromhex(position_as_str))[0]
+        if n_bits == 4 * len(position_as_str) and n_bits % 8 == 0:
+            return int.from_bytes(
+                bytes.fromhex(position_as_str),
+                'big',
+                signed=True,
+            )
+
         position_in_counts = int(position_as_str, 16)  # hex is base 16.
 
         # Figure out value where numbers wrap around. For 2's complement that
@@ -518,13 +742,78 @@ class _ElliptecInterface(object):
                 integer.
         """
         # 'gp' for get position.
-        _, _, position_as_str = self.query(address, 'gp')
+        _, _, position_as_str = self.query(
+            address,
+            'gp',
+            timeout=self.query_timeout,
+        )
 
         # Convert to python integer.
         position_in_counts = self._position_str_to_counts(position_as_str)
 
         return position_in_counts
 
+    def home_many(self, addresses, clockwise=True):
+        """Home several Elliptec devices.
+
+        This is equivalent to calling `self.home()` for each device, except
+        that the commands are sent with `self.query_many()`, which checks the
+        responses.
+
+        Args:
+            addresses (list): The bus addresses of the devices.
+            clockwise (bool, optional): (Default=True) If set to `True`, the
+                devices will home by moving clockwise. If set to `False`, the
+                devices will home by moving counterclockwise.
+
+        Returns:
+            responses (dict): The dictionary returned by `self.query_many()`.
+                See that method's documentation for more information.
+
+        Raises:
+            ElliptecError: If a device doesn't respond as expected.
+        """
+        # Clear the values of the last set positions.
+        for address in addresses:
+            self.last_set_positions_in_counts[address] = None
+
+        # 0 for clockwise, 1 for counterclockwise.
+        direction = str(int(not clockwise))
+
+        # 'ho' for home, which devices answer with their position once done.
+        messages = [(address, 'ho' + direction) for address in addresses]
+        return self.query_many(messages, 'PO')
+
+    def get_positions(self, addresses):
+        """Get the current positions of several Elliptec devices.
+
+        The position requests are sent with `self.query_many()`, which checks
+        the responses.
+
+        Args:
+            addresses (list): The bus addresses of the devices.
+
+        Returns:
+            positions_in_counts (dict): A dictionary with the addresses as its
+                keys and the positions in encoder counts as its values.
+
+        Raises:
+            ElliptecError: If a device doesn't respond as expected.
+        """
+        # 'gp' for get position, which devices answer with 'PO'.
+        messages = [(address, 'gp') for address in addresses]
+        responses = self.query_many(
+            messages,
+            'PO',
+            timeout=self.query_timeout,
+        )
+        positions_in_counts = {}
+        for address, (_, _, position_as_str) in responses.items():
+            positions_in_counts[address] = self._position_str_to_counts(
+                position_as_str,
+            )
+        return positions_in_counts
+
     def move(self, address, position_in_counts, fresh=True):
         """Move the Elliptec device to the desired position.
 
@@ -552,17 +841,77 @@ class _ElliptecInterface(object):
             # Convert position to string in necessary format.
             position_as_str = self._position_counts_to_str(position_in_counts)
 
+            # Clear the last set position first so that if the move fails, the
+            # next move isn't skipped by smart programming.
+            self.last_set_positions_in_counts[address] = None
+
             # 'ma' for move absolute.
             return_message = self.query(address, 'ma' + position_as_str)
 
             # Update last set position.
             self.last_set_positions_in_counts[address] = position_in_counts
         else:
-            print(f"Used smart programming; didn't move.")
+            logger.debug(
+                "Used smart programming; didn't move address %s.", address)
             return_message = None
 
         return return_message
 
+    def move_many(self, positions_in_counts, fresh=True):
+        """Move several Elliptec devices to their desired positions.
+
+        This is equivalent to calling `self.move()` for each device, except
+        that the commands are sent with `self.query_many()`, which checks the
+        responses.
+
+        Args:
+            positions_in_counts (dict): A dictionary with the bus addresses of
+                devices as its keys and their desired positions in encoder
+                counts as its values.
+            fresh (bool, optional): (Default=`True`) Whether or not to instruct
+                devices to move even if they were last set to the same
+                position. See `self.move()` for more information.
+
+        Returns:
+            responses (dict): A dictionary with the bus addresses of the devices
+                that were instructed to move as its keys and the tuples returned
+                by `self.read()` as its values. Devices that weren't instructed
+                to move are omitted.
+
+        Raises:
+            ElliptecError: If a device doesn't respond as expected.
+        """
+        # Figure out which devices actually need to be moved.
+        messages = []
+        for address, position_in_counts in positions_in_counts.items():
+            last_set_position = self.last_set_positions_in_counts[address]
+            if fresh or (position_in_counts != last_set_position):
+                # 'ma' for move absolute.
+                position_as_str = self._position_counts_to_str(
+                    position_in_counts,
+                )
+                messages.append((address, 'ma' + position_as_str))
+            else:
+                logger.debug(
+                    "Used smart programming; didn't move address %s.", address)
+        if not messages:
+            return {}
+
+        # Clear the last set positions first so that if the moves fail, the
+        # next moves aren't skipped by smart programming.
+        for address, _ in messages:
+            self.last_set_positions_in_counts[address] = None
+
+        # Devices respond with their position once they finish moving.
+        responses = self.query_many(messages, 'PO')
+
+        # Update last set positions.
+        for address, _ in messages:
+            position_in_counts = positions_in_counts[address]
+            self.last_set_positions_in_counts[address] = position_in_counts
+
+        return responses
+
     def move_relative(self, address, relative_position_in_counts):
         """Move the Elliptec device by the desired amount.
 
@@ -624,13 +973,16 @@ class ElliptecWorker(Worker):
                 the value specified in the connection table, a `ValueError` is
                 raised.
         """
+        # Get the actual serial numbers of all of the devices.
+        actual_serial_numbers = self.controller.get_serial_numbers(
+            list(self.connection_serial_numbers.keys()),
+        )
+
         # Compare actual serial number to serial number in connection table for
         # each device.
         for connection, serial_number in self.connection_serial_numbers.items():
             # Get the actual serial number of the device at this connection.
-            actual_serial_number = self.controller.get_serial_number(
-                connection,
-            )
+            actual_serial_number = actual_serial_numbers.get(connection)
 
             # Make sure serial_number is a string since actual_serial_number
             # is.
@@ -645,26 +997,34 @@ class ElliptecWorker(Worker):
                 raise ValueError(message)
 
     def do_homing(self):
-        """Home devices that are configured to be homed on startup."""
-        for connection, home_on_startup in self.homing_settings.items():
-            if home_on_startup:
-                self.controller.home(connection)
-                # Return to position set in GUI.
-                if connection in self.initial_front_panel_values:
-                    position = self.initial_front_panel_values[connection]
-                    values = {connection: position}
-                    self.move(values, fresh=True)
+        """Home devices that are configured to be homed on startup.
+
+        All of the devices are homed, then they are all returned to their
+        positions set in the GUI.
+        """
+        connections = [
+            connection
+            for connection, home_on_startup in self.homing_settings.items()
+            if home_on_startup
+        ]
+        if not connections:
+            return
+        self.controller.home_many(connections)
+
+        # Return to positions set in GUI.
+        values = {
+            connection: self.initial_front_panel_values[connection]
+            for connection in connections
+            if connection in self.initial_front_panel_values
+        }
+        if values:
+            self.move(values, fresh=True)
 
     def check_remote_values(self):
-        remote_values = {}
-        for connection in self.child_connections:
-            remote_values[connection] = self.controller.get_position(
-                connection)
-        return remote_values
+        return self.controller.get_positions(self.child_connections)
 
     def move(self, values, fresh=True):
-        for connection, value in values.items():
-            self.controller.move(connection, value, fresh=fresh)
+        self.controller.move_many(values, fresh=fresh)
         return self.check_remote_values()
 
     def program_manual(self, values):
@@ -675,8 +1035,10 @@ class ElliptecWorker(Worker):
         with h5py.File(h5file, 'r') as hdf5_file:
             group = hdf5_file['/devices/' + device_name]
             if 'static_values' in group:
-                data = group['static_values']
-                values = {name: data[0][name] for name in data.dtype.names}
+                # Read the single row of the table from the file once, then
+                # get the fields from the in-memory copy.
+                row = group['static_values'][0]
+                values = {name: row[name] for name in row.dtype.names}
             else:
                 values = {}
         return self.move(values, fresh=fresh)
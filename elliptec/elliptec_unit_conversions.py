@@ -1,3 +1,4 @@
+import numpy as np
 from labscript_utils.unitconversions.UnitConversionBase import UnitConversion
 
 
@@ -25,24 +26,35 @@ class ELL14_Unit_Converter(UnitConversion):
 
         UnitConversion.__init__(self, self.parameters)
 
+        # Store the calibration as floats so the conversion methods don't need
+        # to look them up each time, and store the inverse of the slope so that
+        # converting to counts needs a multiplication rather than a division.
+        self._slope = float(self.parameters['slope'])
+        self._offset = float(self.parameters['offset'])
+        self._inv_slope = 1. / self._slope
+
     def deg_to_base(self, position_deg):
+        # Work with arrays so that whole arrays of positions can be converted
+        # at once.
+        position_deg = np.asarray(position_deg, dtype=float)
+
         # Convert to range -180 to +180 degrees.
-        position_deg = position_deg % 360.
-        if position_deg >= 180.:
-            position_deg = position_deg - 360.
+        position_deg = np.mod(position_deg, 360.)
+        position_deg = np.where(
+            position_deg >= 180.,
+            position_deg - 360.,
+            position_deg,
+        )
 
         # Now convert to encoder counts.
-        slope = self.parameters['slope']
-        offset = self.parameters['offset']
-        position_counts = (position_deg - offset) / slope
-
-        # Round to nearest integer.
-        position_counts = round(position_counts)
+        position_counts = (position_deg - self._offset) * self._inv_slope
 
-        return position_counts
+        # Round to nearest integer. Scalar inputs give a python int as before.
+        position_counts = np.rint(position_counts)
+        if position_counts.ndim == 0:
+            return int(position_counts)
+        return position_counts.astype(int)
 
     def deg_from_base(self, position_counts):
-        slope = self.parameters['slope']
-        offset = self.parameters['offset']
-        position_deg = slope * position_counts + offset
+        position_deg = self._slope * position_counts + self._offset
         return position_deg
@@ -129,9 +129,11 @@ class ElliptecInterfaceBoard(IntermediateDevice):
         connections = sorted(actuators.keys())
 
         # Construct data for hdf5 file.
+        # Build the single row in one go rather than setting each field.
         dtypes = [(connection, np.float64) for connection in connections]
-        static_value_table = np.empty(1, dtype=dtypes)
-        for connection, actuator in actuators.items():
-            static_value_table[connection][0] = actuator.static_value
+        static_values = tuple(
+            actuators[connection].static_value for connection in connections
+        )
+        static_value_table = np.array([static_values], dtype=dtypes)
         grp = self.init_device_group(hdf5_file)
         grp.create_dataset('static_values', data=static_value_table)
@@ -26,6 +26,9 @@ class KDC101Tab(DeviceTab):
         self.allow_homing = device.properties['allow_homing']
         self.mock = device.properties['mock']
         self.kinesis_path = device.properties['kinesis_path']
+        # Connection tables compiled before this property was added don't
+        # include it, in which case the worker uses its default.
+        self.polling_interval = device.properties.get('polling_interval')
 
         # Create the AO output objects
         ao_prop = {}
@@ -64,6 +67,7 @@ class KDC101Tab(DeviceTab):
                 'allow_homing': self.allow_homing,
                 'mock': self.mock,
                 'kinesis_path': self.kinesis_path,
+                'polling_interval': self.polling_interval,
                 'child_connections': self.child_connections,
                 'initial_front_panel_values': self.get_front_panel_values(),
             },
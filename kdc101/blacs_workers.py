@@ -8,6 +8,8 @@
 # the project for the full license.                                 #
 #                                                                   #
 #####################################################################
+import logging
+import random
 import sys
 import time
 
@@ -27,27 +29,53 @@ System = None
 DeviceManagerCLI = None
 KCubeDCServo = None
 
+logger = logging.getLogger(__name__)
+
+
+def _wait_until(condition, message, timeout=2.0, interval=0.01):
+    """Wait until a condition is met.
+
+    Args:
+        condition (callable): A function that takes no arguments and returns
+            `True` once the condition is met.
+        message (str): The message for the error raised if the condition isn't
+            met before the timeout.
+        timeout (float, optional): (Default=2.0) The maximum time to wait in
+            seconds.
+        interval (float, optional): (Default=0.01) The time to wait between
+            checks of the condition in seconds.
+
+    Raises:
+        TimeoutError: If the condition isn't met before the timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            raise TimeoutError(dedent(message))
+        time.sleep(interval)
+
 
 class _MockKDC101Interface(MockZaberInterface):
-    def __init__(self, serial_number, kinesis_path):
+    def __init__(self, serial_number, kinesis_path, polling_interval=None):
         self.serial_number = serial_number
         self.is_homed = False
         self.kinesis_path = kinesis_path
+        self.polling_interval = polling_interval
         self.position = 0
         # Keep track of last set position for smart programming.
         self.last_set_position = None
 
     def home(self):
         self.is_homed = True
-        print("Mock device homed.")
+        logger.info("Mock device homed.")
 
     def move(self, position, fresh=True):
         if fresh or (position != self.last_set_position):
             self.position = position
             self.last_set_position = position
-            print(f"Mock moved device to position {position}.")
+            logger.info("Mock moved device to position %s.", position)
         else:
-            print(f"Mock used smart programming; didn't move.")
+            logger.debug("Mock used smart programming; didn't move.")
 
     def get_position(self):
         return self.position
@@ -59,10 +87,13 @@ class _KDC101Interface(object):
     default_timeout = int(60e3)  # Timeout in ms.
     polling_interval = 250  # Polling period in ms.
 
-    def __init__(self, serial_number, kinesis_path):
-        # Store initialization parameters.
+    def __init__(self, serial_number, kinesis_path, polling_interval=None):
+        # Store initialization parameters. If no polling interval is provided,
+        # the class's default is used.
         self.serial_number = serial_number
         self.kinesis_path = kinesis_path
+        if polling_interval is not None:
+            self.polling_interval = polling_interval
 
         # Import the required python libraries.
         self._import_python_libraries()
@@ -73,41 +104,72 @@ class _KDC101Interface(object):
         # Open a connection to the controller.
         self.open()
 
-        # Start the device polling.
-        # The polling loop requests regular status requests to the motor to
-        # ensure the program keeps track of the device.
-        self.controller.StartPolling(int(self.polling_interval))
-        time.sleep(0.5)
-
-        # Enable the channel otherwise any move is ignored.
-        self.controller.EnableDevice()
-        time.sleep(0.5)
-
-        # Call LoadMotorConfiguration on the device to initialize the
-        # DeviceUnitConverter object required for real world unit parameters.
-        # Loads configuration information into channel.
-        motor_configuration = self.controller.LoadMotorConfiguration(
-            str(self.serial_number)
-        )
-
-        # The .NET help files suggest the following step, but it seems to be
-        # fine to skip it. That may required connecting to the device with the
-        # Kinesis GUI first though.
-        # The API requires stage type to be specified.
-        # Name of motor or stage being controlled (check in Kinesis GUI).
-        # device_settings_name = 'Z812'
-        # motor_configuration.DeviceSettingsName = device_settings_name
-
-        # Get the device unit converter.
-        motor_configuration.UpdateCurrentConfiguration()
+        # Set up the controller. If anything goes wrong, stop polling and
+        # disconnect before re-raising so that the device isn't left connected,
+        # which would make the next connection attempt fail.
+        try:
+            # Start the device polling.
+            # The polling loop requests regular status requests to the motor to
+            # ensure the program keeps track of the device.
+            # The connection is already open at this point, so wait until the
+            # driver has received the device's settings and status rather than
+            # just until it's connected.
+            self.controller.StartPolling(int(self.polling_interval))
+            message = f"""KDC101 with serial number {self.serial_number} didn't
+                report its settings after polling was started."""
+            _wait_until(
+                self.controller.IsSettingsInitialized,
+                message,
+                timeout=10.0,
+            )
+
+            # Enable the channel otherwise any move is ignored. Return as soon
+            # as the device reports that it's enabled rather than after a fixed
+            # delay.
+            self.controller.EnableDevice()
+            message = f"""KDC101 with serial number {self.serial_number} didn't
+                report being enabled after it was enabled."""
+            _wait_until(lambda: self.controller.IsEnabled, message)
+
+            # Call LoadMotorConfiguration on the device to initialize the
+            # DeviceUnitConverter object required for real world unit
+            # parameters.
+            # Loads configuration information into channel.
+            motor_configuration = self.controller.LoadMotorConfiguration(
+                str(self.serial_number)
+            )
+
+            # The .NET help files suggest the following step, but it seems to
+            # be fine to skip it. That may required connecting to the device
+            # with the Kinesis GUI first though.
+            # The API requires stage type to be specified.
+            # Name of motor or stage being controlled (check in Kinesis GUI).
+            # device_settings_name = 'Z812'
+            # motor_configuration.DeviceSettingsName = device_settings_name
+
+            # Get the device unit converter.
+            motor_configuration.UpdateCurrentConfiguration()
+        except Exception:
+            # Stop polling and disconnect, as done by self.close().
+            self.close()
+            raise
+
+        # Look up the .NET members used for every move once here, since each
+        # attribute access through pythonnet is relatively slow.
+        self._move_to = self.controller.MoveTo
+        self._decimal = System.Decimal
+        self._to_double = System.Decimal.ToDouble
 
         # Keep track of last set position for smart programming.
         self.last_set_position = None
 
     def _import_python_libraries(self):
-        # Import required python libraries.
+        # Import required python libraries. They only need to be imported once
+        # per process. System is imported last, so if it's set then so is clr.
         global clr
         global System
+        if System is not None:
+            return
         try:
             import clr
             import System
@@ -117,6 +179,15 @@ class _KDC101Interface(object):
             raise ImportError(dedent(message))
 
     def _import_kinesis_libraries(self):
+        global DeviceManagerCLI
+        global KCubeDCServo
+
+        # The kinesis .NET libraries only need to be loaded once per process.
+        # KCubeDCServo is imported last, so if it's set then so is
+        # DeviceManagerCLI.
+        if KCubeDCServo is not None:
+            return
+
         # Add path to kinesis .NET libraries if provided.
         if self.kinesis_path and (self.kinesis_path not in sys.path):
             sys.path.append(self.kinesis_path)
@@ -125,12 +196,10 @@ class _KDC101Interface(object):
         try:
             # Import DeviceManagerCLI into .NET's Common Language Runtime (CLR)
             # so we can then import it into python.
-            global DeviceManagerCLI
             clr.AddReference("Thorlabs.MotionControl.DeviceManagerCLI")
             from Thorlabs.MotionControl import DeviceManagerCLI  # pylint: disable=import-error
 
             # Import class that controls KDC101.
-            global KCubeDCServo
             clr.AddReference("Thorlabs.MotionControl.KCube.DCServoCLI")
             from Thorlabs.MotionControl.KCube.DCServoCLI import KCubeDCServo  # pylint: disable=import-error
         except System.IO.FileNotFoundException:
@@ -143,7 +212,9 @@ class _KDC101Interface(object):
 
         When blacs opens and tries to connect to many devices at once, the
         drivers sometimes fails to find the device. To work around that, this
-        method tries a few times before giving up.
+        method tries a few times before giving up. The time between attempts
+        grows exponentially and is randomized so that devices that failed at
+        the same time don't all retry in lockstep.
 
         Raises:
             DeviceNotReadyException: Raised if the connection to the device
@@ -151,13 +222,19 @@ class _KDC101Interface(object):
                 device is not connected, or that the serial number provided is
                 incorrect.
         """
+        # Settings for the backoff between attempts. Times are in seconds.
+        base_delay = 0.2
+        max_delay = 8
+        timeout = 60
+
         need_to_connect = True
         n_connection_attempt = 1
         max_attempts = 10
+        deadline = time.monotonic() + timeout
         while need_to_connect and (n_connection_attempt <= max_attempts):
             try:
-                # Print info for debugging.
-                print(f"Connection attempt {n_connection_attempt}...")
+                # Log info for debugging.
+                logger.info("Connection attempt %d...", n_connection_attempt)
 
                 # Build device list so that drivers can find the controller.
                 DeviceManagerCLI.DeviceManagerCLI.BuildDeviceList()
@@ -172,11 +249,20 @@ class _KDC101Interface(object):
 
                 # If an error wasn't thrown, the connection was a success.
                 need_to_connect = False
-                print("Connected.")
+                logger.info("Connected.")
             except DeviceManagerCLI.DeviceNotReadyException as err:
-                n_connection_attempt += 1
                 connection_error = err  # Save for re-raising later.
-                time.sleep(1)
+                # Wait around the current backoff delay, or give up if that
+                # was the last attempt or waiting would take us past the
+                # deadline.
+                delay = min(max_delay, base_delay * 2**n_connection_attempt)
+                delay = delay * random.uniform(0.5, 1.5)
+                if n_connection_attempt >= max_attempts:
+                    break
+                if time.monotonic() + delay > deadline:
+                    break
+                time.sleep(delay)
+                n_connection_attempt += 1
 
         # If we still haven't connected after multiple tries, give up and raise
         # the error.
@@ -188,27 +274,31 @@ class _KDC101Interface(object):
         return self.controller.Status.IsHomed
 
     def home(self):
-        print("Homing...")
+        logger.info("Homing...")
         self.last_set_position = None
         self.controller.Home(self.default_timeout)
-        print("Finshed Homing.")
+        logger.info("Finished homing.")
 
     def move(self, position, fresh=True):
         # System.Decimal doesn't handle numpy floats, so make sure it's a normal
         # built-in python float.
         position = float(position)
         if fresh or (position != self.last_set_position):
-            self.controller.MoveTo(
-                System.Decimal(position),
+            self._move_to(
+                self._decimal(position),
                 self.default_timeout,
             )
             self.last_set_position = position
-            print(f"Moved device to position {position}.")
+            logger.info("Moved device to position %s.", position)
         else:
-            print(f"Used smart programming; didn't move.")
+            logger.debug("Used smart programming; didn't move.")
 
     def get_position(self):
-        return float(str(self.controller.Position))
+        # The Position property returns the position from the driver's most
+        # recent status poll, so this doesn't wait on the device. The value may
+        # be up to one polling interval old. It's a System.Decimal, which is
+        # converted directly rather than formatting then parsing a string.
+        return float(self._to_double(self.controller.Position))
 
     def close(self):
         # Stop the driver's periodic checks on the actuator position.
@@ -219,16 +309,22 @@ class _KDC101Interface(object):
 
 
 class KDC101Worker(Worker):
+    # Polling period in ms for the driver's status requests. If it isn't
+    # provided when the worker is created, the interface's default is used.
+    polling_interval = None
+
     def init(self):
         if self.mock:
             self.controller = _MockKDC101Interface(
                 self.serial_number,
                 self.kinesis_path,
+                polling_interval=self.polling_interval,
             )
         else:
             self.controller = _KDC101Interface(
                 self.serial_number,
                 self.kinesis_path,
+                polling_interval=self.polling_interval,
             )
 
         if not self.controller.is_homed:
@@ -243,10 +339,10 @@ class KDC101Worker(Worker):
                 raise RuntimeError(dedent(message))
 
     def check_remote_values(self):
-        remote_values = {}
-        for connection in self.child_connections:
-            remote_values[connection] = self.controller.get_position()
-        return remote_values
+        # The KDC101 only has one channel, so get its position once and report
+        # it for every connection.
+        position = self.controller.get_position()
+        return dict.fromkeys(self.child_connections, position)
 
     def _move(self, values, fresh=True):
         for _, position in values.items():
@@ -261,8 +357,10 @@ class KDC101Worker(Worker):
         with h5py.File(h5file, 'r') as hdf5_file:
             group = hdf5_file['/devices/' + device_name]
             if 'static_values' in group:
-                data = group['static_values']
-                values = {name: data[0][name] for name in data.dtype.names}
+                # Read the single row of the table from the file once, then
+                # get the fields from the in-memory copy.
+                row = group['static_values'][0]
+                values = {name: row[name] for name in row.dtype.names}
             else:
                 values = {}
         return self._move(values, fresh=fresh)
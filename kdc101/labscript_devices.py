@@ -51,11 +51,17 @@ class KDC101(IntermediateDevice):
     @set_passed_properties(
         property_names={
             'connection_table_properties':
-                ['serial_number', 'allow_homing', 'mock', 'kinesis_path'],
+                [
+                    'serial_number',
+                    'allow_homing',
+                    'mock',
+                    'kinesis_path',
+                    'polling_interval',
+                ],
         }
     )
-    def __init__(self, name, serial_number,
-                 allow_homing, mock=False, kinesis_path=None, **kwargs):
+    def __init__(self, name, serial_number, allow_homing, mock=False,
+                 kinesis_path=None, polling_interval=250, **kwargs):
         """Device for controlling a KDC101.
 
         Add the brushled DC servo motor controlled by this KDC101 as a child
@@ -77,7 +83,7 @@ class KDC101(IntermediateDevice):
                 procedure. Homing can be done using the Kinesis GUI in that
                 case, once the user has ensured that it is safe to do so.
             mock (bool, optional): (Default=False) If set to True then no real
-                actuator will be used. Instead a dummy that simply prints what
+                actuator will be used. Instead a dummy that simply logs what
                 a real stage would do is used instead. This is helpful for
                 testing and development.
             kinesis_path (str): The path to the Thorlabs Kinesis folder, which
@@ -85,6 +91,11 @@ class KDC101(IntermediateDevice):
                 direcotry will be added to python's sys.path so that the Kinesis
                 .NET libraries necessary for interfacing with the controller can
                 be loaded.
+            polling_interval (int, optional): (Default=250) The period, in
+                milliseconds, at which the Kinesis driver requests the status of
+                the controller. The position reported to BLACS may be up to this
+                old. Larger values reduce the background USB traffic and CPU
+                usage for each controller.
             **kwargs: Further keyword arguents are passed to the `__init__()`
                 method of the parent class (IntermediateDevice).
         """
@@ -103,9 +114,11 @@ class KDC101(IntermediateDevice):
         connections = sorted(actuators.keys())
 
         # Construct data for hdf5 file.
+        # Build the single row in one go rather than setting each field.
         dtypes = [(connection, np.float64) for connection in connections]
-        static_value_table = np.empty(1, dtype=dtypes)
-        for connection, actuator in actuators.items():
-            static_value_table[connection][0] = actuator.static_value
+        static_values = tuple(
+            actuators[connection].static_value for connection in connections
+        )
+        static_value_table = np.array([static_values], dtype=dtypes)
         grp = self.init_device_group(hdf5_file)
         grp.create_dataset('static_values', data=static_value_table)